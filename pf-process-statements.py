@@ -19,10 +19,11 @@ running this script.
 
 Features:
 - Validates Odoo connection credentials before proceeding.
-- Detects and logs blank CAMT.053 files (no transactions present).
+- Detects and logs blank CAMT.053 files (no transactions present), using all CPU cores.
 - Extracts statement IDs from XML files.
-- Skips duplicate statements that already exist in Odoo.
-- Encodes and uploads valid XML files into Odoo's `account.statement.import` model.
+- Skips duplicate statements that already exist in Odoo or appear in more than one file.
+- Remembers imported statement IDs in a local SQLite cache, so re-runs skip them without asking Odoo.
+- Encodes and uploads valid XML files into Odoo's `account.statement.import` model, several at a time.
 - Provides logging and debug options for detailed tracking.
 
 Usage:
@@ -33,10 +34,14 @@ Usage:
 - Use `--blank` to only detect blank CAMT.053 files.
 - Use `--test-connection` to validate Odoo credentials.
 - Use `--debug` for verbose logging.
+- Use `--workers=N` to set the number of concurrent uploads (default: 8).
+- Use `--cache-file=PATH` to move the local cache of imported statement IDs, or `--no-cache` to
+  ignore it (e.g. after deleting statements in Odoo that should be imported again).
 
 Dependencies:
 - Python 3
-- Standard libraries: os, logging, argparse, xml.etree.ElementTree, xmlrpc.client, base64
+- Standard libraries: os, io, mmap, re, sqlite3, time, logging, argparse, threading, concurrent.futures, xml.etree.ElementTree, xmlrpc.client, base64
+- Optional: lxml (faster XML parsing; already installed alongside Odoo, falls back to ElementTree)
 
 License:
 This software is licensed under the MIT License. You are free to use, modify, and distribute it,
@@ -47,34 +52,81 @@ provided that proper attribution is given to the original author. See the LICENS
 import os
 import logging
 import argparse
-import xml.etree.ElementTree as ET
 import xmlrpc.client
 import base64
+import io
+import mmap
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
+try:
+    import lxml.etree as ET
+    HAVE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    HAVE_LXML = False
 
-import os
-import logging
-import argparse
-import xml.etree.ElementTree as ET
-import xmlrpc.client
-import base64
+# Clark-notation tags for the CAMT.053 elements we look for
+CAMT053_NS = "urn:iso:std:iso:20022:tech:xsd:camt.053.001.04"
+NTRY_TAG = f"{{{CAMT053_NS}}}Ntry"
+STMT_TAG = f"{{{CAMT053_NS}}}Stmt"
+ID_TAG = f"{{{CAMT053_NS}}}Id"
+
+# CAMT.053 file names: case-insensitive "camt.053" prefix, ".xml" suffix
+CAMT053_FILE_RE = re.compile(r"(?i:camt\.053).*\.xml", re.DOTALL)
+
+DEFAULT_CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pf-fds-odoo", "imported.sqlite"
+)
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
 def setup_logging(debug_mode):
     """Sets up logging."""
     logging.basicConfig(
         level=logging.DEBUG if debug_mode else logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
+        format=LOG_FORMAT,
     )
     logging.debug("Logging setup complete. Debug mode is active.")
 
+def init_worker_logging(level):
+    """Sets up logging in a worker process (a no-op if it was inherited via fork)."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+_thread_local = threading.local()
+
+def get_transport(odoo_url):
+    """Returns the calling thread's XML-RPC transport.
+
+    A transport keeps its HTTP(S) connection open between requests, so sharing
+    one per thread lets every proxy on that thread reuse a single socket (and
+    TLS session) instead of reconnecting. Transports are not thread-safe, hence
+    one per thread.
+    """
+    transport = getattr(_thread_local, "transport", None)
+    if transport is None:
+        if odoo_url.lower().startswith("https:"):
+            transport = xmlrpc.client.SafeTransport()
+        else:
+            transport = xmlrpc.client.Transport()
+        _thread_local.transport = transport
+    return transport
+
+def get_proxy(odoo_url, endpoint):
+    """Returns a proxy for an Odoo XML-RPC endpoint ("common" or "object")."""
+    return xmlrpc.client.ServerProxy(f"{odoo_url}/xmlrpc/2/{endpoint}", transport=get_transport(odoo_url))
+
 def validate_odoo_connection(url, db, username, password):
     """Tests the connection to the Odoo database."""
-    logging.debug(f"Validating connection to Odoo: {url}, DB: {db}, User: {username}")
+    logging.debug("Validating connection to Odoo: %s, DB: %s, User: %s", url, db, username)
     try:
-        common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
+        common = get_proxy(url, "common")
         uid = common.authenticate(db, username, password, {})
         if uid:
-            logging.debug(f"Connection successful. User ID: {uid}")
+            logging.debug("Connection successful. User ID: %s", uid)
             print(f"Connection successful: User ID {uid}")
             return uid
         else:
@@ -85,119 +137,290 @@ def validate_odoo_connection(url, db, username, password):
         logging.exception("Error connecting to Odoo:")
         return None
 
+def scan_camt053(source):
+    """Scans a CAMT.053 file in a single streaming pass.
+
+    source is a file path or a binary file-like object (e.g. an mmap) positioned
+    at the start of the document. Returns a tuple (has_entries, stmt_id) and
+    stops reading as soon as both are known. Raises ET.ParseError if the file is
+    not well-formed XML.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return scan_camt053(file)
+    has_entries = False
+    stmt_id = None
+    if HAVE_LXML:
+        # Never load DTDs or resolve entities (older lxml resolves them by default),
+        # so the lxml path is at least as strict as ElementTree
+        context = ET.iterparse(
+            source,
+            events=("end",),
+            tag=(ID_TAG, NTRY_TAG),
+            resolve_entities=False,
+            no_network=True,
+            load_dtd=False,
+        )
+        for _, elem in context:
+            if elem.tag == NTRY_TAG:
+                has_entries = True
+            elif stmt_id is None and elem.getparent().tag == STMT_TAG:
+                stmt_id = (elem.text or "").strip() or None
+            if has_entries and stmt_id is not None:
+                break
+            # Free finished elements so memory stays flat on large statements
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+    else:
+        # ElementTree has no getparent(), so keep the open ancestors on a stack
+        path = []
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                path.append(elem)
+                continue
+            path.pop()
+            parent = path[-1] if path else None
+            if elem.tag == NTRY_TAG:
+                has_entries = True
+            elif elem.tag == ID_TAG and stmt_id is None and parent is not None and parent.tag == STMT_TAG:
+                stmt_id = (elem.text or "").strip() or None
+            if has_entries and stmt_id is not None:
+                break
+            # Detach finished elements so memory stays flat here too; earlier
+            # siblings are already gone, so elem is the parent's first child
+            if parent is not None:
+                parent.remove(elem)
+    return has_entries, stmt_id
+
 def is_blank_camt053(file_path):
     """Checks if a CAMT.053 file is blank (no transactions)."""
-    logging.debug(f"Checking file for blank status: {file_path}")
-    try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        ns = {'ns': 'urn:iso:std:iso:20022:tech:xsd:camt.053.001.04'}
-        entries = root.findall(".//ns:Ntry", ns)
-        if not entries:
-            logging.debug(f"File is blank: {file_path}")
+    logging.debug("Checking file for blank status: %s", file_path)
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            logging.debug("File is blank: %s", file_path)
             return True
-        logging.debug(f"File has transactions: {file_path}")
-        return False
-    except ET.ParseError as e:
-        logging.error(f"Error parsing XML file {file_path}: {e}")
-        return False
+        # Map the file once and use the same pages for the byte search and the parse
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # A raw byte search settles the blank case without parsing the whole file.
+            # Only files that mention Ntry need the parser, which confirms the match is
+            # a real element (not e.g. a comment) and stops at the first entry.
+            if data.find(b"<Ntry") == -1 and data.find(b":Ntry") == -1:
+                logging.debug("File is blank: %s", file_path)
+                return True
+            try:
+                has_entries, _ = scan_camt053(data)
+            except ET.ParseError as e:
+                logging.error("Error parsing XML file %s: %s", file_path, e)
+                return False
+    if not has_entries:
+        logging.debug("File is blank: %s", file_path)
+        return True
+    logging.debug("File has transactions: %s", file_path)
+    return False
+
+def list_camt053_files(directory):
+    """Returns the directory entries of all CAMT.053 XML files in a directory."""
+    candidates = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not CAMT053_FILE_RE.fullmatch(entry.name) or not entry.is_file():
+                logging.debug("Skipping non-CAMT.053 file: %s", entry.name)
+                continue
+            candidates.append(entry)
+    return candidates
 
 def process_directory_for_blanks(directory):
     """Processes all CAMT.053 files in a directory to find blank files."""
-    logging.debug(f"Processing directory for blank files: {directory}")
-    for file_name in os.listdir(directory):
-        file_path = os.path.join(directory, file_name)
-        logging.debug(f"Inspecting file: {file_name}")
-        if not file_name.lower().startswith("camt.053") or not file_name.endswith(".xml"):
-            logging.debug(f"Skipping non-CAMT.053 file: {file_name}")
-            continue
+    logging.debug("Processing directory for blank files: %s", directory)
+    candidates = list_camt053_files(directory)
+    paths = [entry.path for entry in candidates]
+    # Each file is parsed independently, so spread the work over all CPUs
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        initializer=init_worker_logging,
+        initargs=(logging.getLogger().level,),
+    ) as executor:
+        results = executor.map(is_blank_camt053, paths, chunksize=32)
+        for entry, is_blank in zip(candidates, results):
+            if is_blank:
+                print(f"Blank file detected: {entry.name}")
+                logging.info("Blank file: %s", entry.name)
 
-        if is_blank_camt053(file_path):
-            print(f"Blank file detected: {file_name}")
-            logging.info(f"Blank file: {file_name}")
-
-
-def process_directory(directory, odoo_url, db, username, password, debug):
-    if debug:
-        logging.debug(f"Processing directory: {directory}")
-    common = xmlrpc.client.ServerProxy(f"{odoo_url}/xmlrpc/2/common")
-    uid = common.authenticate(db, username, password, {})
-    models = xmlrpc.client.ServerProxy(f"{odoo_url}/xmlrpc/2/object")
-    
-    for file_name in os.listdir(directory):
-        file_path = os.path.join(directory, file_name)
-        if not file_name.endswith(".xml"):
-            if debug:
-                logging.debug(f"Skipping non-XML file: {file_name}")
-            continue
-        
-        if debug:
-            logging.debug(f"Inspecting file: {file_name}")
-        
-        if is_blank_camt053(file_path):
-            logging.info(f"Skipping blank file: {file_name}")
-            continue
+
+def upload_statement(odoo_url, db, uid, password, file_name, file_path):
+    """Uploads a single CAMT.053 file to Odoo and imports it."""
+    models = get_proxy(odoo_url, "object")
+    # Encode in chunks so the raw file is never held in memory alongside its encoding
+    encoded = io.BytesIO()
+    with open(file_path, "rb") as file:
+        base64.encode(file, encoded)
+    encoded_file = encoded.getvalue().decode("ascii")
+    # create and import_file_button cannot be merged into one request: Odoo's
+    # /xmlrpc/2/object endpoint has no system.multicall, and the second call
+    # needs the ID returned by the first. Concurrent uploads hide the extra
+    # round-trip instead.
+    statement_id = models.execute_kw(
+        db,
+        uid,
+        password,
+        "account.statement.import",
+        "create",
+        [{"statement_filename": file_name, "statement_file": encoded_file}],
+    )
+    models.execute_kw(
+        db,
+        uid,
+        password,
+        "account.statement.import",
+        "import_file_button",
+        [[statement_id]],
+    )
+
+def open_import_cache(cache_file, odoo_url, db):
+    """Opens the local cache of imported statement IDs, creating it if needed.
+
+    Entries are scoped to the Odoo URL and database, so runs against different
+    targets (e.g. a test and a production database) never skip each other's
+    statements. Returns a tuple (connection, stmt_ids) with the IDs recorded for
+    this target, or (None, set()) if the cache cannot be used; the import then
+    simply runs without it.
+    """
+    cache = None
+    try:
+        cache_dir = os.path.dirname(cache_file)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        cache = sqlite3.connect(cache_file)
+        cache.execute("PRAGMA journal_mode=WAL")
+        cache.execute(
+            "CREATE TABLE IF NOT EXISTS imported ("
+            "odoo_url TEXT, db TEXT, stmt_id TEXT, ts INTEGER, PRIMARY KEY (odoo_url, db, stmt_id))"
+        )
+        stmt_ids = {
+            row[0]
+            for row in cache.execute("SELECT stmt_id FROM imported WHERE odoo_url = ? AND db = ?", (odoo_url, db))
+        }
+    except (OSError, sqlite3.Error) as e:
+        logging.warning("Could not open import cache %s: %s", cache_file, e)
+        if cache is not None:
+            cache.close()
+        return None, set()
+    logging.debug("Loaded %s statement IDs from import cache: %s", len(stmt_ids), cache_file)
+    return cache, stmt_ids
+
+def record_imported(cache, odoo_url, db, stmt_ids):
+    """Adds statement IDs for the given Odoo database to the import cache, if one is in use."""
+    if cache is None:
+        return
+    ts = int(time.time())
+    try:
+        with cache:
+            cache.executemany(
+                "INSERT OR IGNORE INTO imported (odoo_url, db, stmt_id, ts) VALUES (?, ?, ?, ?)",
+                [(odoo_url, db, stmt_id, ts) for stmt_id in stmt_ids],
+            )
+    except sqlite3.Error as e:
+        logging.warning("Could not update import cache: %s", e)
+
+def process_directory(directory, odoo_url, db, uid, password, workers=8, cache=None, imported=frozenset()):
+    """Imports new CAMT.053 files from a directory into Odoo as the authenticated user uid.
+
+    Statement IDs in imported are skipped; those found in or uploaded to Odoo are
+    added to the cache connection, if one is given.
+    """
+    logging.debug("Processing directory: %s", directory)
+    models = get_proxy(odoo_url, "object")
+
+    # Parse all files locally first, collecting {stmt_id: (file_name, file_path)}
+    statements = {}
+    for entry in list_camt053_files(directory):
+        file_name, file_path = entry.name, entry.path
+        logging.debug("Inspecting file: %s", file_name)
         
-        # Extract the statement ID
+        # Detect blank files and extract the statement ID in one pass
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                tree = ET.parse(file)
-                root = tree.getroot()
-                ns = {'ns': 'urn:iso:std:iso:20022:tech:xsd:camt.053.001.04'}
-                stmt_id_node = root.find(".//ns:Stmt/ns:Id", namespaces=ns)
-                if stmt_id_node is None or not stmt_id_node.text:
-                    logging.error(f"Could not extract statement ID from file: {file_name}")
-                    continue
-                stmt_id = stmt_id_node.text.strip()
+            has_entries, stmt_id = scan_camt053(file_path)
         except Exception as e:
-            logging.error(f"Error extracting statement ID from file {file_name}: {e}")
+            logging.error("Error extracting statement ID from file %s: %s", file_name, e)
             continue
 
-        if debug:
-            logging.debug(f"Extracted statement ID: {stmt_id} from file: {file_name}")
-        
-        # Check if statement already exists in Odoo
-        try:
-            existing_statement = models.execute_kw(
-                db,
-                uid,
-                password,
-                "account.bank.statement",
-                "search",
-                [[["name", "=", stmt_id]]],
+        if not has_entries:
+            logging.info("Skipping blank file: %s", file_name)
+            continue
+
+        if stmt_id is None:
+            logging.error("Could not extract statement ID from file: %s", file_name)
+            continue
+
+        logging.debug("Extracted statement ID: %s from file: %s", stmt_id, file_name)
+
+        if stmt_id in imported:
+            logging.info("Statement with ID %s was already imported. Skipping file: %s", stmt_id, file_name)
+            continue
+
+        # Re-downloads can leave several files for the same statement; keep the first
+        if stmt_id in statements:
+            logging.info(
+                "Statement with ID %s already found in file: %s. Skipping file: %s",
+                stmt_id, statements[stmt_id][0], file_name,
             )
-            if existing_statement:
-                logging.info(f"Statement with ID {stmt_id} already exists in Odoo. Skipping file: {file_name}")
-                continue
-        except Exception as e:
-            logging.error(f"Error checking statement existence in Odoo for {stmt_id}: {e}")
             continue
+        statements[stmt_id] = (file_name, file_path)
 
-        # Upload the file to Odoo
-        try:
-            with open(file_path, "rb") as file:
-                file_data = file.read()
-                encoded_file = base64.b64encode(file_data).decode("utf-8")
-                statement_id = models.execute_kw(
-                    db,
-                    uid,
-                    password,
-                    "account.statement.import",
-                    "create",
-                    [{"statement_filename": file_name, "statement_file": encoded_file}],
-                )
-                models.execute_kw(
-                    db,
-                    uid,
-                    password,
-                    "account.statement.import",
-                    "import_file_button",
-                    [[statement_id]],
-                )
-            logging.info(f"Successfully uploaded file: {file_name} to Odoo.")
-        except Exception as e:
-            logging.error(f"Error uploading file {file_name} to Odoo: {e}")
+    if not statements:
+        return
+
+    # Check which statements already exist in Odoo with a single query
+    try:
+        existing_statements = models.execute_kw(
+            db,
+            uid,
+            password,
+            "account.bank.statement",
+            "search_read",
+            [[["name", "in", list(statements)]]],
+            {"fields": ["name"]},
+        )
+    except Exception as e:
+        logging.error("Error checking statement existence in Odoo: %s", e)
+        return
+    existing_names = {statement["name"] for statement in existing_statements}
+    record_imported(cache, odoo_url, db, existing_names)
+
+    uploads = []
+    for stmt_id, (file_name, file_path) in statements.items():
+        if stmt_id in existing_names:
+            logging.info("Statement with ID %s already exists in Odoo. Skipping file: %s", stmt_id, file_name)
+            continue
+        uploads.append((stmt_id, file_name, file_path))
 
+    # Upload the remaining files to Odoo concurrently
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(upload_statement, odoo_url, db, uid, password, file_name, file_path): (stmt_id, file_name)
+            for stmt_id, file_name, file_path in uploads
+        }
+        for future in as_completed(futures):
+            stmt_id, file_name = futures[future]
+            try:
+                future.result()
+                logging.info("Successfully uploaded file: %s to Odoo.", file_name)
+            except Exception as e:
+                logging.error("Error uploading file %s to Odoo: %s", file_name, e)
+                continue
+            record_imported(cache, odoo_url, db, [stmt_id])
+
+
+def positive_int(value):
+    """argparse type for options that must be an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 def main():
     parser = argparse.ArgumentParser(description="Process CAMT.053 files and import into Odoo.")
@@ -209,6 +432,13 @@ def main():
     parser.add_argument("--test-connection", action="store_true", help="Test connection to Odoo")
     parser.add_argument("--blank", action="store_true", help="Show blank files")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode for detailed logs")
+    parser.add_argument("--workers", type=positive_int, default=8, help="Number of concurrent uploads to Odoo (default: 8)")
+    parser.add_argument(
+        "--cache-file",
+        default=DEFAULT_CACHE_FILE,
+        help=f"Local cache of already imported statement IDs (default: {DEFAULT_CACHE_FILE})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the local cache of imported statements")
 
     args = parser.parse_args()
 
@@ -220,20 +450,30 @@ def main():
         return
 
     # Validate connection to Odoo if not using --blank
-    connection_valid = validate_odoo_connection(args.odoo_url, args.db, args.username, args.password)
-    if not connection_valid:
+    # The user ID from this single authentication is reused for all later calls
+    uid = validate_odoo_connection(args.odoo_url, args.db, args.username, args.password)
+    if not uid:
         print("Failed to connect to Odoo. Exiting.")
         return
 
+    # Statements recorded as imported by earlier runs are skipped without asking Odoo
+    cache, imported = (None, set()) if args.no_cache else open_import_cache(args.cache_file, args.odoo_url, args.db)
+
     # Process directory
-    process_directory(
-        args.directory,
-        args.odoo_url,
-        args.db,
-        args.username,
-        args.password,
-        args.debug,  # Pass the debug argument to the function
-    )
+    try:
+        process_directory(
+            args.directory,
+            args.odoo_url,
+            args.db,
+            uid,
+            args.password,
+            args.workers,
+            cache,
+            imported,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
     main()